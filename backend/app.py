@@ -1,17 +1,33 @@
 import os
-import time
-import uuid
+import asyncio
+import itertools
+import logging
 import random
-from typing import Dict, List
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager, suppress
+from typing import Dict, List, Optional, Tuple
 
+import anyio.to_thread
+import orjson
 import psutil
-from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
-from pydantic import BaseModel
+from fastapi.responses import FileResponse, Response
+from pydantic import BaseModel, ConfigDict
+
+logger = logging.getLogger(__name__)
+
+# Each tune-pool thread gets its own random generator instead of sharing the
+# module-level one across concurrent fine-tunes.
+_rng = threading.local()
 
 # This class represents a simple AI model.
 class AIModel:
+    # Fixed attribute set, so skip the per-instance __dict__.
+    __slots__ = ("model_id", "name", "version", "metrics", "deployed")
+
     def __init__(self, model_id: str, name: str, version: str, metrics: Dict = None):
         self.model_id = model_id
         self.name = name
@@ -23,50 +39,128 @@ class AIModel:
 class ModelManager:
     def __init__(self):
         self.models: Dict[str, AIModel] = {}
+        # JSON-ready dict for each model, kept in sync on every change.
+        self._views: Dict[str, Dict] = {}
+        # Name -> id index so lookups by name don't scan every model.
+        self._by_name: Dict[str, str] = {}
+        # Serialized /models payload, rebuilt lazily after any change.
+        self._list_cache: Optional[bytes] = None
+        # Short, cheap model ids ("m1", "m2", ...) instead of UUID strings.
+        self._next_id = itertools.count(1)
+        # Dedicated threads for training work, so it never competes with the
+        # threadpool FastAPI uses for request handling.
+        self._tune_pool = ThreadPoolExecutor(
+            max_workers=int(os.getenv("TUNE_POOL", "2")), thread_name_prefix="tune"
+        )
         # Add a couple of test models on startup.
         self.add_model("Model A", "1.0")
         self.add_model("Model B", "1.0")
 
     def add_model(self, name: str, version: str) -> AIModel:
-        new_id = str(uuid.uuid4())
+        new_id = f"m{next(self._next_id)}"
         model = AIModel(new_id, name, version)
         self.models[new_id] = model
+        self._by_name[name] = new_id
+        self._views[new_id] = {
+            "model_id": model.model_id,
+            "name": model.name,
+            "version": model.version,
+            "deployed": model.deployed,
+            "metrics": model.metrics,
+        }
+        self._list_cache = None
         return model
 
     def list_models(self) -> List[AIModel]:
         return list(self.models.values())
 
+    def list_models_json(self) -> bytes:
+        if self._list_cache is None:
+            self._list_cache = orjson.dumps(list(self._views.values()))
+        return self._list_cache
+
     def get_model(self, model_id: str) -> AIModel:
         return self.models.get(model_id)
 
+    def get_view(self, model_id: str) -> Dict:
+        return self._views.get(model_id)
+
+    def get_by_name(self, name: str) -> AIModel:
+        model_id = self._by_name.get(name)
+        return self.models.get(model_id) if model_id else None
+
     def deploy_model(self, model_id: str) -> AIModel:
         model = self.get_model(model_id)
         if model:
             model.deployed = True
+            self._views[model_id]["deployed"] = True
+            self._list_cache = None
             return model
         raise ValueError("Model not found")
 
-    def fine_tune_model(self, model_id: str, tuning_params: Dict) -> AIModel:
+    async def fine_tune_model(self, model_id: str, tuning_params: Dict) -> AIModel:
         model = self.get_model(model_id)
         if not model:
             raise ValueError("Model not found")
-        # Simulate a fine-tuning process.
-        print(f"Starting fine-tuning for {model.name}...")
-        time.sleep(5)  # Pretend we're fine-tuning here.
-        model.metrics["accuracy"] = round(random.uniform(0.80, 0.99), 3)
+        logger.debug("Starting fine-tuning for %s...", model.name)
+        loop = asyncio.get_running_loop()
+        accuracy = await loop.run_in_executor(self._tune_pool, self._train, tuning_params)
+        model.metrics["accuracy"] = accuracy
         if "new_version" in tuning_params:
             model.version = tuning_params["new_version"]
-        print(f"Finished fine-tuning for {model.name}: {model.metrics}")
+        view = self._views[model_id]
+        view["metrics"] = model.metrics
+        view["version"] = model.version
+        self._list_cache = None
+        logger.debug("Finished fine-tuning for %s: %s", model.name, model.metrics)
         return model
 
+    def _train(self, tuning_params: Dict) -> float:
+        # Simulate a fine-tuning process. This runs on the tune pool, so it is
+        # free to block like real (CPU-bound) training would.
+        time.sleep(5)  # Pretend we're fine-tuning here.
+        rng = getattr(_rng, "r", None)
+        if rng is None:
+            rng = _rng.r = random.Random()
+        # Accuracy in [0.800, 0.990] with three decimals, without round().
+        return rng.randint(800, 990) / 1000
+
     def get_metrics(self, model_id: str) -> Dict:
         model = self.get_model(model_id)
         if model:
             return model.metrics
         raise ValueError("Model not found")
 
-# Initialize the FastAPI app.
-app = FastAPI()
+# Latest CPU usage reading, refreshed in the background so /monitor never
+# has to wait on psutil's sampling interval.
+_cpu_usage: float = 0.0
+
+async def _cpu_sampler():
+    global _cpu_usage
+    # The first non-blocking call only primes psutil's counters.
+    psutil.cpu_percent(interval=None)
+    while True:
+        await asyncio.sleep(1)
+        _cpu_usage = psutil.cpu_percent(interval=None)
+
+# Run the CPU sampler for as long as the app is up. Models live in this
+# process's memory, so the app is meant to run as a single worker; scale it
+# with threads by raising THREAD_LIMIT instead of adding workers.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    limiter = anyio.to_thread.current_default_thread_limiter()
+    limiter.total_tokens = int(os.getenv("THREAD_LIMIT", "40"))
+    sampler = asyncio.create_task(_cpu_sampler())
+    yield
+    sampler.cancel()
+    with suppress(asyncio.CancelledError):
+        await sampler
+    # Drop queued fine-tunes so shutdown doesn't wait on them.
+    manager._tune_pool.shutdown(wait=False, cancel_futures=True)
+
+# Initialize the FastAPI app. Routes return plain dicts, so we skip
+# response_model validation; the hot routes encode with orjson themselves.
+app = FastAPI(lifespan=lifespan)
 
 # Figure out the absolute path to the frontend folder.
 # Our project structure is:
@@ -90,43 +184,68 @@ async def serve_index():
 # Instantiate our model manager.
 manager = ModelManager()
 
+# Cap how many fine-tunes run at once; extra jobs wait for a free slot.
+_tune_sem = asyncio.Semaphore(int(os.getenv("MAX_TUNES", "2")))
+
+# Fine-tunes currently queued or running, with their params, by model id. A
+# second request for the same model with the same params joins the existing
+# run instead of racing it; different params are refused until it finishes.
+_inflight_tunes: Dict[str, Tuple[asyncio.Task, Dict[str, str]]] = {}
+
 # Define the schema for fine-tuning requests.
 class FineTuneRequest(BaseModel):
+    # `model_id` is our own field name, not part of pydantic's `model_`
+    # namespace, so don't warn about it.
+    model_config = ConfigDict(protected_namespaces=())
+
     model_id: str
     tuning_params: Dict[str, str] = {}
 
+# Define the schema for submitting several fine-tuning requests at once.
+class FineTuneBatch(BaseModel):
+    items: List[FineTuneRequest]
+
+# Run one fine-tune in the background, waiting for a free slot first.
+async def _run_fine_tune(model_id: str, tuning_params: Dict[str, str]):
+    try:
+        async with _tune_sem:
+            await manager.fine_tune_model(model_id, tuning_params)
+    except Exception:
+        logger.exception("Error during fine-tuning")
+
+# Start a fine-tune on the event loop unless one is already in flight for
+# this model. Returns "started", "joined" (same params already running) or
+# "conflict" (a run with different params is in progress).
+def _schedule_fine_tune(model_id: str, tuning_params: Dict[str, str]) -> str:
+    inflight = _inflight_tunes.get(model_id)
+    if inflight is not None:
+        return "joined" if inflight[1] == tuning_params else "conflict"
+    task = asyncio.create_task(_run_fine_tune(model_id, tuning_params))
+    _inflight_tunes[model_id] = (task, tuning_params)
+    task.add_done_callback(lambda _: _inflight_tunes.pop(model_id, None))
+    return "started"
+
+# Encode a payload with orjson ourselves, skipping FastAPI's jsonable_encoder
+# pass; every payload here is already plain JSON types.
+def _json_response(payload, headers: Dict[str, str] = None) -> Response:
+    return Response(content=orjson.dumps(payload), media_type="application/json", headers=headers)
+
 # Endpoint to list all models.
-@app.get("/models", response_model=List[Dict])
-def get_all_models():
-    models = manager.list_models()
-    return [
-        {
-            "model_id": model.model_id,
-            "name": model.name,
-            "version": model.version,
-            "deployed": model.deployed,
-            "metrics": model.metrics,
-        }
-        for model in models
-    ]
+@app.get("/models")
+async def get_all_models():
+    return Response(content=manager.list_models_json(), media_type="application/json")
 
 # Endpoint to get details for a single model.
-@app.get("/models/{model_id}", response_model=Dict)
-def get_model_details(model_id: str):
-    model = manager.get_model(model_id)
-    if not model:
+@app.get("/models/{model_id}")
+async def get_model_details(model_id: str):
+    view = manager.get_view(model_id)
+    if view is None:
         raise HTTPException(status_code=404, detail="Model not found")
-    return {
-        "model_id": model.model_id,
-        "name": model.name,
-        "version": model.version,
-        "deployed": model.deployed,
-        "metrics": model.metrics,
-    }
+    return _json_response(view)
 
 # Endpoint to deploy a model.
-@app.post("/deploy/{model_id}", response_model=Dict)
-def deploy_model(model_id: str):
+@app.post("/deploy/{model_id}")
+async def deploy_model(model_id: str):
     try:
         model = manager.deploy_model(model_id)
         return {
@@ -142,36 +261,65 @@ def deploy_model(model_id: str):
         raise HTTPException(status_code=404, detail=str(e))
 
 # Endpoint to start the fine-tuning process in the background.
-@app.post("/finetune", response_model=Dict)
-def start_fine_tuning(request: FineTuneRequest, background_tasks: BackgroundTasks):
-    def background_task():
-        try:
-            manager.fine_tune_model(request.model_id, request.tuning_params)
-        except Exception as err:
-            print(f"Error during fine-tuning: {err}")
+@app.post("/finetune")
+async def start_fine_tuning(request: FineTuneRequest):
+    if manager.get_model(request.model_id) is None:
+        raise HTTPException(status_code=404, detail="Model not found")
+    status = _schedule_fine_tune(request.model_id, request.tuning_params)
+    if status == "conflict":
+        raise HTTPException(status_code=409, detail="Already tuning with different params")
+    if status == "joined":
+        return {"message": "Fine-tuning already in progress.", "status": "joined"}
+    return {"message": "Fine-tuning started in the background.", "status": "started"}
 
-    background_tasks.add_task(background_task)
-    return {"message": "Fine-tuning started in the background."}
+# Endpoint to start several fine-tunes with a single request. Unknown models
+# are reported back instead of failing the whole batch. Models already being
+# tuned with the same params are listed as joined; different params are
+# rejected.
+@app.post("/finetune/batch")
+async def start_batch_fine_tuning(batch: FineTuneBatch):
+    accepted = []
+    joined = []
+    rejected = []
+    for item in batch.items:
+        if manager.get_model(item.model_id) is None:
+            rejected.append({"model_id": item.model_id, "error": "Model not found"})
+            continue
+        status = _schedule_fine_tune(item.model_id, item.tuning_params)
+        if status == "started":
+            accepted.append(item.model_id)
+        elif status == "joined":
+            joined.append(item.model_id)
+        else:
+            rejected.append({"model_id": item.model_id, "error": "Already tuning with different params"})
+    return {"accepted": accepted, "joined": joined, "rejected": rejected}
 
 # Endpoint to fetch model metrics.
-@app.get("/metrics/{model_id}", response_model=Dict)
-def get_model_metrics(model_id: str):
+@app.get("/metrics/{model_id}")
+async def get_model_metrics(model_id: str):
     try:
         metrics = manager.get_metrics(model_id)
-        return {"model_id": model_id, "metrics": metrics}
+        return _json_response({"model_id": model_id, "metrics": metrics})
     except ValueError as err:
         raise HTTPException(status_code=404, detail=str(err))
 
-# Endpoint to monitor system resources.
-@app.get("/monitor", response_model=Dict)
-def system_monitor():
-    cpu_usage = psutil.cpu_percent(interval=1)
+# Fixed-shape /monitor payload, updated in place on each request. Total memory
+# never changes, so it is read once up front.
+_MONITOR_TPL = {
+    "cpu_usage": 0.0,
+    "memory": {"total": psutil.virtual_memory().total, "available": 0, "percent": 0.0},
+}
+
+# Endpoint to monitor system resources. Polling clients get a 304 while the
+# sample hasn't changed, keyed on a weak ETag of CPU and memory usage.
+@app.get("/monitor")
+async def system_monitor(request: Request):
     mem = psutil.virtual_memory()
-    return {
-        "cpu_usage": cpu_usage,
-        "memory": {
-            "total": mem.total,
-            "available": mem.available,
-            "percent": mem.percent,
-        },
-    }
+    etag = f'W/"{hash((_cpu_usage, mem.percent))}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    _MONITOR_TPL["cpu_usage"] = _cpu_usage
+    memory = _MONITOR_TPL["memory"]
+    memory["available"] = mem.available
+    memory["percent"] = mem.percent
+    return _json_response(_MONITOR_TPL, headers={"ETag": etag})